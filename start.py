@@ -1,33 +1,239 @@
 #! /usr/bin/env python3
 
 # Imports
-import re
-import boto3
 import logging
-import sys
+import queue
 import os
 import uuid
-import subprocess
+import functools
+import threading
+from pathlib import Path
+from logging.handlers import QueueHandler, QueueListener
+from concurrent.futures import ThreadPoolExecutor, wait
 
 # Global Resources
 APP_NAME = "acs-assignment"
-CREATION_ID = str(uuid.uuid4())
-ec2 = boto3.resource("ec2")
-s3 = boto3.resource("s3")
-asg = boto3.client("autoscaling")
-elb = boto3.client("elbv2")
+WAITER_CONFIG = {
+    "Delay": 2,
+    "MaxAttempts": 30
+}
+ec2Limit = threading.BoundedSemaphore(8)
+sessionLock = threading.Lock()
+clients = {}
+ec2Resource = None
 
 
-# Logging Configuration
-logging.basicConfig(
-    format="%(asctime)s %(levelname)s: %(message)s",
-    filename="./log.log",
-    filemode="w",
-    level="INFO"
-)
+# Definitions
+def configureLogging() -> QueueListener:
+    """
+    Configures logging to './log.log'. Records are passed to a background
+    listener through a queue, so worker threads never wait on the file.
+    The returned listener has to be passed to stopLogging() to flush the
+    remaining records.
+    """
+
+    fileHandler = logging.FileHandler("./log.log", mode="w")
+    fileHandler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s: %(message)s"))
+    logQueue = queue.Queue(-1)
+
+    rootLogger = logging.getLogger()
+    rootLogger.setLevel(logging.INFO)
+    rootLogger.addHandler(QueueHandler(logQueue))
+
+    listener = QueueListener(logQueue, fileHandler)
+    listener.start()
+    return listener
+
+
+def stopLogging(listener: QueueListener):
+    """
+    Flushes the remaining log records, closes the log file and removes
+    the queue handler installed by configureLogging(), so that logging
+    can be configured again by a later run.
+
+    listener -> QueueListener:
+        The listener returned by configureLogging().
+    """
+
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+    rootLogger = logging.getLogger()
+    for handler in rootLogger.handlers[:]:
+        if isinstance(handler, QueueHandler) and handler.queue is listener.queue:
+            rootLogger.removeHandler(handler)
+
+
+@functools.lru_cache(maxsize=1)
+def getCreationId() -> str:
+    """
+    Returns the ID with which to identify all resources of this run. It
+    is generated on first use so importing the module has no side effects.
+    """
+
+    return str(uuid.uuid4())
+
+
+@functools.lru_cache(maxsize=1)
+def getBotoConfig() -> object:
+    """
+    Returns the config shared by all clients and resources. boto3 and
+    botocore are only imported once AWS is actually needed, so importing
+    this module stays cheap.
+    """
+
+    from botocore.config import Config
+    return Config(
+        max_pool_connections=32,
+        retries={
+            "mode": "adaptive",
+            "max_attempts": 10
+        },
+        tcp_keepalive=True,
+        parameter_validation=False
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def getSession() -> object:
+    """
+    Returns the boto3 session all clients and resources are created from,
+    so the service models and credentials are only loaded once. Creating
+    it on first use defers credential discovery until main() actually
+    needs AWS. Must be called while holding the session lock.
+    """
+
+    import boto3
+    return boto3.session.Session()
+
+
+def getClient(service: str) -> object:
+    """
+    Returns the low level client for the given service. Clients are
+    thread safe, so a single one per service is shared by all threads.
+    The check and the creation both happen under the session lock, so
+    threads that ask at the same time still get the same client.
+
+    service -> String:
+        The name of the AWS service, e.g. 'autoscaling'.
+    """
+
+    if service not in clients:
+        with sessionLock:
+            if service not in clients:
+                clients[service] = getSession().client(service, config=getBotoConfig())
+    return clients[service]
+
+
+def getEc2() -> object:
+    """
+    Returns the EC2 resource shared by all threads. Resource actions like
+    create_subnet() or delete() are plain calls on the underlying client,
+    which is thread safe. Worker threads only ever call actions and read
+    attributes that are already loaded, they never lazy load an object
+    another thread is using. Like getClient(), the resource is only ever
+    created once, even if several threads ask for it at the same time.
+    """
+
+    global ec2Resource
+    if ec2Resource is None:
+        with sessionLock:
+            if ec2Resource is None:
+                ec2Resource = getSession().resource("ec2", config=getBotoConfig())
+    return ec2Resource
+
+
+def limited(semaphore, function, *args, **kwargs) -> object:
+    """
+    Runs a function while holding a slot of the given semaphore. This caps
+    how many concurrent requests go to one service, keeping bursts within
+    its throttling limits.
+
+    semaphore -> BoundedSemaphore:
+        The semaphore of the service the function sends requests to.
+    function -> Function:
+        The function to run. Is called with the remaining arguments.
+    """
+
+    with semaphore:
+        return function(*args, **kwargs)
+
+
+def finishedResult(future, default) -> object:
+    """
+    Returns the result of a finished background task, or the default if
+    the task failed or was never started.
+
+    future -> Future:
+        The future of the task. May be None if it was never submitted.
+    default -> Object:
+        The value to return if there is no result.
+    """
+
+    if future is None or future.exception() is not None:
+        return default
+    return future.result()
+
+
+@functools.lru_cache(maxsize=1)
+def loadScript(path=Path(__file__).parent.joinpath("scripts", "webapp.sh")) -> str:
+    """
+    Reads a startup script from disk. The contents are cached so the
+    file is only read once per process.
+
+    path -> Path:
+        The path to the script to read. Defaults to the web app script
+        next to this file, independent of the working directory.
+    """
+
+    return Path(path).read_text()
+
+
+def buildTags(id: str, name=None) -> list:
+    """
+    Builds the list of tags given to every resource.
+
+    id -> String:
+        The ID with which to identify all resources.
+    name -> String:
+        The value of the Name tag. No Name tag is added if left out.
+    """
+
+    tags = [
+        {
+            "Key": "ID",
+            "Value": id
+        }
+    ]
+    if name is not None:
+        tags.insert(0, {
+            "Key": "Name",
+            "Value": name
+        })
+    return tags
+
+
+def buildTagSpecifications(resourceType: str, id: str, name=None) -> list:
+    """
+    Builds the TagSpecifications parameter for the EC2 create calls.
+
+    resourceType -> String:
+        The type of the resource being tagged, e.g. 'subnet'.
+    id -> String:
+        The ID with which to identify all resources.
+    name -> String:
+        The value of the Name tag. No Name tag is added if left out.
+    """
+
+    return [
+        {
+            "ResourceType": resourceType,
+            "Tags": buildTags(id, name)
+        }
+    ]
 
 
-# Definitions
 def createKeyPair(name: str, id: str, dry=False) -> object:
     """
     Creates an EC2 Key Pair and saves it as a file accessable to the user.
@@ -41,27 +247,22 @@ def createKeyPair(name: str, id: str, dry=False) -> object:
     """
 
     logging.info("Creating Key Pair...")
-    key = ec2.create_key_pair(
+    key = getEc2().create_key_pair(
         KeyName=f"{name}-key",
         DryRun=dry,
-        TagSpecifications=[
-            {
-                "ResourceType": "key-pair",
-                "Tags": [
-                    {
-                        "Key": "ID",
-                        "Value": id
-                    },
-                ]
-            },
-        ]
+        TagSpecifications=buildTagSpecifications("key-pair", id)
     )
 
-    # Writes the key to a file
-    keyFile = open(f"{key.key_name}.pem", "w")
-    keyFile.write(key.key_material)
-    keyFile.close()
-    logging.info(f"Created Key Pair. Saved file as: '{key.key_name}.pem'")
+    # Writes the key to a file that only the user can read, as ssh refuses
+    # keys that are accessible to others. The mode is set again in case the
+    # file was left over from an earlier run, as os.open only applies it to
+    # new files. os.fchmod isn't available on every platform.
+    keyDescriptor = os.open(f"{key.key_name}.pem", os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    if hasattr(os, "fchmod"):
+        os.fchmod(keyDescriptor, 0o600)
+    with os.fdopen(keyDescriptor, "w") as keyFile:
+        keyFile.write(key.key_material)
+    logging.info("Created Key Pair. Saved file as: '%s.pem'", key.key_name)
 
     return key
 
@@ -80,30 +281,16 @@ def createVpc(name: str, id: str, cidr: str, dry=False) -> object:
         Whether or not to run as a dry run.
     """
 
-    vpc = ec2.create_vpc(
+    vpc = getEc2().create_vpc(
         CidrBlock=cidr,
         DryRun=dry,
-        TagSpecifications=[
-            {
-                "ResourceType": "vpc",
-                "Tags": [
-                    {
-                        "Key": "Name",
-                        "Value": f"{name}-vpc"
-                    },
-                    {
-                        "Key": "ID",
-                        "Value": id
-                    }
-                ]
-            }
-        ]
+        TagSpecifications=buildTagSpecifications("vpc", id, f"{name}-vpc")
     )
-    logging.info(f"Created VPC with CIDR: '{cidr}'")
+    logging.info("Created VPC with CIDR: '%s'", cidr)
     return vpc
 
 
-def createRouteTable(name: str, id: str, vpc: object, dry=False) -> object:
+def createRouteTable(name: str, id: str, vpc: object, gatewayId: str, dry=False) -> object:
     """
     Creates a route table for the specified VPC.
 
@@ -113,19 +300,19 @@ def createRouteTable(name: str, id: str, vpc: object, dry=False) -> object:
         The ID with which to identify all resources.
     vpc -> Object:
         The VPC Object to which to attach the route table.
+    gatewayId -> String:
+        The ID of the Internet Gateway to route public traffic through.
     dry -> Boolean:
         Whether or not to run as a dry run.
     """
 
-    for gate in vpc.internet_gateways.all():
-        gateId = gate.id
-
-    for route in vpc.route_tables.all():
-        rt = route
+    rt = next(iter(vpc.route_tables.all()), None)
+    if rt is None:
+        raise RuntimeError(f"No route table found for VPC '{vpc.vpc_id}'")
 
     rt.create_route(
         DestinationCidrBlock="0.0.0.0/0",
-        GatewayId=gateId,
+        GatewayId=gatewayId,
         DryRun=dry,
     )
 
@@ -148,23 +335,9 @@ def createGateway(name: str, id: str, vpc: object, dry=False) -> object:
         Whether or not to run as a dry run.
     """
 
-    gateway = ec2.create_internet_gateway(
+    gateway = getEc2().create_internet_gateway(
         DryRun=dry,
-        TagSpecifications=[
-            {
-                "ResourceType": "internet-gateway",
-                "Tags": [
-                    {
-                        "Key": "Name",
-                        "Value": f"{name}-gateway"
-                    },
-                    {
-                        "Key": "ID",
-                        "Value": id
-                    }
-                ]
-            }
-        ]
+        TagSpecifications=buildTagSpecifications("internet-gateway", id, f"{name}-gateway")
     )
 
     vpc.attach_internet_gateway(
@@ -191,52 +364,23 @@ def createSubnets(name: str, id: str, vpc: object, dry=False) -> object:
         Whether or not to run as a dry run.
     """
 
-    # A for loop to create 6 Subnets, a private and a public subnet in all
-    # three Avalability Zones
-    cidrStart = re.sub(r"([.]\d+){2}([/]\d+){1}", "", vpc.cidr_block)
-    subnets = [None] * 6
-    for i in range(3):
-        subnets[i] = vpc.create_subnet(
-            AvailabilityZoneId=f"euw1-az{i+1}",
-            CidrBlock=f"{cidrStart}.{i+1}.0/24",
-            DryRun=dry,
-            TagSpecifications=[
-                {
-                    "ResourceType": "subnet",
-                    "Tags": [
-                        {
-                            "Key": "Name",
-                            "Value": f"{name}-public-subnet-{i+1}"
-                        },
-                        {
-                            "Key": "ID",
-                            "Value": id
-                        }
-                    ]
-                }
-            ]
-        )
-
-        subnets[i+3] = vpc.create_subnet(
-            AvailabilityZoneId=f"euw1-az{i+1}",
-            CidrBlock=f"{cidrStart}.{i+4}.0/24",
-            DryRun=dry,
-            TagSpecifications=[
-                {
-                    "ResourceType": "subnet",
-                    "Tags": [
-                        {
-                            "Key": "Name",
-                            "Value": f"{name}-private-subnet-{i+1}"
-                        },
-                        {
-                            "Key": "ID",
-                            "Value": id
-                        }
-                    ]
-                }
-            ]
-        )
+    # Build the parameters for 6 Subnets, a public and a private subnet in
+    # all three Avalability Zones. Public subnets come first.
+    cidrStart = ".".join(vpc.cidr_block.split("/")[0].split(".")[:2])
+    subnetParams = []
+    for access, offset in (("public", 1), ("private", 4)):
+        for i in range(3):
+            subnetParams.append({
+                "AvailabilityZoneId": f"euw1-az{i+1}",
+                "CidrBlock": f"{cidrStart}.{i+offset}.0/24",
+                "DryRun": dry,
+                "TagSpecifications": buildTagSpecifications("subnet", id, f"{name}-{access}-subnet-{i+1}")
+            })
+
+    # The subnets are independent of each other so they are all created
+    # at once. map() keeps the results in the same order as the parameters.
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        subnets = list(executor.map(lambda params: limited(ec2Limit, vpc.create_subnet, **params), subnetParams))
     logging.info("Created Subnets")
     return subnets
 
@@ -259,61 +403,46 @@ def createSecurityGroups(name: str, id: str, vpc: object, dry=False) -> object:
         Description=f"A security group for the {name} app.",
         GroupName=f"{name}-security-group",
         DryRun=dry,
-        TagSpecifications=[
-            {
-                    "ResourceType": "security-group",
-                    "Tags": [
-                        {
-                            "Key": "Name",
-                            "Value": f"{name}-security"
-                        },
-                        {
-                            "Key": "ID",
-                            "Value": id
-                        }
-                    ]
-            }
-        ]
+        TagSpecifications=buildTagSpecifications("security-group", id, f"{name}-security")
     )
 
-    # Allow HTTP access for viewing of the webserver
-    sg.authorize_ingress(IpPermissions=[{
-        "FromPort": 80,
-        "ToPort": 80,
-        "IpProtocol": "tcp",
-        "IpRanges": [
-            {
-                "CidrIp": "0.0.0.0/0",
-                "Description": "Allow HTTP access."
-            }
-        ]
-    }])
-
-    # Allow HTTPs access for viewing of the webserver
-    sg.authorize_ingress(IpPermissions=[{
-        "FromPort": 443,
-        "ToPort": 443,
-        "IpProtocol": "tcp",
-        "IpRanges": [
-            {
-                "CidrIp": "0.0.0.0/0",
-                "Description": "Allow HTTPs access."
-            }
-        ]
-    }])
-
-    # Allow SSH access for configuration of the webserver
-    sg.authorize_ingress(IpPermissions=[{
-        "FromPort": 22,
-        "ToPort": 22,
-        "IpProtocol": "tcp",
-        "IpRanges": [
-            {
-                "CidrIp": "0.0.0.0/0",
-                "Description": "Allow SSH access for configuration of the EC2 instances."
-            }
-        ]
-    }])
+    # Allow HTTP and HTTPs access for viewing of the webserver and SSH
+    # access for its configuration. All rules are authorized in one call.
+    sg.authorize_ingress(IpPermissions=[
+        {
+            "FromPort": 80,
+            "ToPort": 80,
+            "IpProtocol": "tcp",
+            "IpRanges": [
+                {
+                    "CidrIp": "0.0.0.0/0",
+                    "Description": "Allow HTTP access."
+                }
+            ]
+        },
+        {
+            "FromPort": 443,
+            "ToPort": 443,
+            "IpProtocol": "tcp",
+            "IpRanges": [
+                {
+                    "CidrIp": "0.0.0.0/0",
+                    "Description": "Allow HTTPs access."
+                }
+            ]
+        },
+        {
+            "FromPort": 22,
+            "ToPort": 22,
+            "IpProtocol": "tcp",
+            "IpRanges": [
+                {
+                    "CidrIp": "0.0.0.0/0",
+                    "Description": "Allow SSH access for configuration of the EC2 instances."
+                }
+            ]
+        }
+    ])
     logging.info("Created Security Group")
     return sg
 
@@ -330,27 +459,18 @@ def createTargetGroup(name: str, id: str, vpc: object, dry=False) -> dict:
         The VPC Object whose instances to reference.
     """
 
-    targetGroup = elb.create_target_group(
+    targetGroup = getClient("elbv2").create_target_group(
         Name=f"{name}-target-group",
         Protocol="HTTP",
         Port=80,
         VpcId=vpc.vpc_id,
         TargetType="instance",
-        Tags=[
-            {
-                "Key": "Name",
-                "Value": f"{name}-gateway"
-            },
-            {
-                "Key": "ID",
-                "Value": id
-            }
-        ]
+        Tags=buildTags(id, f"{name}-gateway")
     )["TargetGroups"][0]
     return targetGroup
 
 
-def createAutoScaler(name: str, id: str, vpc: object, launchConfig: str, targetGroup: dict, dry=False) -> str:
+def createAutoScaler(name: str, id: str, subnetIds: list, launchConfig: str, targetGroup: dict, dry=False) -> str:
     """
     This function creates an Auto Scaler based of off a EC2 Launch Configuration.
 
@@ -358,8 +478,8 @@ def createAutoScaler(name: str, id: str, vpc: object, launchConfig: str, targetG
         The name to be given to the Auto Scaler.
     id -> String:
         The ID with which to identify all resources.
-    vpc -> Object:
-        The VPC Object within which to create the Auto Scaler.
+    subnetIds -> List:
+        The IDs of the public Subnets within which to create the Auto Scaler.
     launchCongif -> String:
         The name of the Launch Configuration on which the scaled resources will be based.
     targetGroup -> Dictionary:
@@ -368,43 +488,22 @@ def createAutoScaler(name: str, id: str, vpc: object, launchConfig: str, targetG
         Whether or not to run as a dry run.
     """
 
-    subnets = ""
-    count = 0
-    for subnet in vpc.subnets.all():
-        if "public" in subnet.tags[0]["Value"] or "public" in subnet.tags[1]["Value"]:
-            if count <= 1:
-                subnets += f"{subnet.subnet_id}, "
-                count += 1
-            elif count == 2:
-                subnets += f"{subnet.subnet_id}"
-                count += 1
-                break
-
-    asg.create_auto_scaling_group(
+    getClient("autoscaling").create_auto_scaling_group(
         AutoScalingGroupName=f"{name}-auto-scaling-group",
         LaunchConfigurationName=launchConfig,
-        VPCZoneIdentifier=subnets,
+        VPCZoneIdentifier=",".join(subnetIds),
         MinSize=1,
         MaxSize=10,
         DesiredCapacity=1,
         DefaultCooldown=180,
         TargetGroupARNs=[targetGroup["TargetGroupArn"]],
-        Tags=[
-            {
-                "Key": "Name",
-                "Value": f"{name}-auto-scaling-group"
-            },
-            {
-                "Key": "ID",
-                "Value": id
-            }
-        ]
+        Tags=buildTags(id, f"{name}-auto-scaling-group")
     )
     logging.info("Created Auto Scaler")
     return f"{name}-auto-scaling-group"
 
 
-def createLoadBalancer(name: str, id: str, vpc: object, targetGroup: dict, dry=False) -> dict:
+def createLoadBalancer(name: str, id: str, sgId: str, subnetIds: list, dry=False) -> dict:
     """
     Creates a load balancer that is named as specified.
 
@@ -412,39 +511,51 @@ def createLoadBalancer(name: str, id: str, vpc: object, targetGroup: dict, dry=F
         The name to be given to the Load Balancer.
     id -> String:
         The ID with which to identify all resources.
-    vpc -> Object:
-        The VPC Object within which to create the Load Balancer.
-    targetGroup -> Dictionary:
-        The target group that the loadbalancer references.
+    sgId -> String:
+        The ID of the Security Group to assign to the Load Balancer.
+    subnetIds -> List:
+        The IDs of the public Subnets within which to create the Load Balancer.
     dry -> Boolean:
         Whether or not to run as a dry run.
     """
 
-    for sg in vpc.security_groups.all():
-        if sg.group_name != "default":
-            secGroup = sg.group_id
-            break
-
-    subnetIds = []
-    for subnet in vpc.subnets.all():
-        if "public" in subnet.tags[0]["Value"] or "public" in subnet.tags[1]["Value"]:
-            subnetIds.append(subnet.subnet_id)
-
-    loadBalancer = elb.create_load_balancer(
+    loadBalancer = getClient("elbv2").create_load_balancer(
         Name=f"{name}-load-balancer",
         Subnets=subnetIds,
-        SecurityGroups=[secGroup],
+        SecurityGroups=[sgId],
         Type="application",
         IpAddressType="ipv4",
-        Tags=[
-            {
-                "Key": "ID",
-                "Value": id
-            }
-        ]
+        Tags=buildTags(id)
     )["LoadBalancers"][0]
+    logging.info("Created Load Balancer: %s", loadBalancer["DNSName"])
+    return loadBalancer
+
+
+def createListener(name: str, id: str, loadBalancer: dict, targetGroup: dict, dry=False):
+    """
+    Creates a listener that forwards HTTP traffic from the load balancer
+    to the target group. Kept apart from createLoadBalancer() so that the
+    load balancer is known to cleanup even if this step fails.
+
+    name -> String:
+        The name to be given to the Listener.
+    id -> String:
+        The ID with which to identify all resources.
+    loadBalancer -> Dictionary:
+        The load balancer to add the listener to.
+    targetGroup -> Dictionary:
+        The target group that the listener forwards to.
+    dry -> Boolean:
+        Whether or not to run as a dry run.
+    """
+
+    # Make sure the load balancer is visible before adding the listener
+    getClient("elbv2").get_waiter("load_balancer_exists").wait(
+        LoadBalancerArns=[loadBalancer["LoadBalancerArn"]],
+        WaiterConfig=WAITER_CONFIG
+    )
 
-    elb.create_listener(
+    getClient("elbv2").create_listener(
         LoadBalancerArn=loadBalancer["LoadBalancerArn"],
         Protocol="HTTP",
         Port=80,
@@ -454,23 +565,13 @@ def createLoadBalancer(name: str, id: str, vpc: object, targetGroup: dict, dry=F
                 "TargetGroupArn": targetGroup["TargetGroupArn"]
             }
         ],
-        Tags=[
-            {
-                "Key": "Name",
-                "Value": f"{name}-listener"
-            },
-            {
-                "Key": "ID",
-                "Value": id
-            }
-        ]
+        Tags=buildTags(id, f"{name}-listener")
     )
-    logging.info(f"Created Load Balancer: {loadBalancer['DNSName']}")
+    logging.info("Created Listener")
     print(f"Address: http://{loadBalancer['DNSName']}/index")
-    return loadBalancer
 
 
-def createLaunchConfig(name: str, id: str, key: object, vpc: object, script, dry=False) -> str:
+def createLaunchConfig(name: str, id: str, key: object, sgId: str, script, dry=False) -> str:
     """
     Creates a launch configuration that is named as specified.
 
@@ -480,8 +581,8 @@ def createLaunchConfig(name: str, id: str, key: object, vpc: object, script, dry
         The ID with which to identify all resources.
     key -> String:
         The Pey Pair with which to create the Launch Configuration.
-    vpc -> Object:
-        The VPC Object within which to create the Load Balancer.
+    sgId -> String:
+        The ID of the Security Group to assign to the launched instances.
     script -> String:
         The startup script to pass on to the Launch Configuration
         that is executed at the start of the instances launch.
@@ -489,12 +590,7 @@ def createLaunchConfig(name: str, id: str, key: object, vpc: object, script, dry
         Whether or not to run as a dry run.
     """
 
-    for sg in vpc.security_groups.all():
-        if sg.group_name != "default":
-            sgId = sg.group_id
-            break
-
-    asg.create_launch_configuration(
+    getClient("autoscaling").create_launch_configuration(
         LaunchConfigurationName=f"{name}-launch-config",
         ImageId="ami-04d76fb85cd82256b",
         KeyName=key.key_name,
@@ -506,6 +602,20 @@ def createLaunchConfig(name: str, id: str, key: object, vpc: object, script, dry
     return f"{name}-launch-config"
 
 
+def deleteGateway(gateway: object, vpcId: str):
+    """
+    Detaches an Internet Gateway from its VPC and deletes it.
+
+    gateway -> Object:
+        The gateway resource to delete.
+    vpcId -> String:
+        The ID of the VPC the gateway is attached to.
+    """
+
+    gateway.detach_from_vpc(VpcId=vpcId)
+    gateway.delete()
+
+
 def cleanup(key: object, vpc: object, launchConfig: str, targetGroup: dict, loadBalancer: dict, autoScaler: str):
     """
     A function to delete all the created resources.
@@ -526,45 +636,61 @@ def cleanup(key: object, vpc: object, launchConfig: str, targetGroup: dict, load
 
     success = True
     try:
-        if key != None:
+        if key is not None:
             key.delete()
 
-        if vpc != None:
-            for securityGroup in vpc.security_groups.all():
-                if securityGroup.group_name != "default":
-                    securityGroup.delete()
-
-            for gateway in vpc.internet_gateways.all():
-                gateway.detach_from_vpc(VpcId=vpc.vpc_id)
-                gateway.delete()
-
-            for subnet in vpc.subnets.all():
-                subnet.delete()
+        if vpc is not None:
+            with ThreadPoolExecutor(max_workers=16) as executor:
+                # List each of the VPC's dependents exactly once, all at the
+                # same time.
+                securityGroups, gateways, subnets, routeTables = executor.map(
+                    lambda collection: limited(ec2Limit, list, collection.all()),
+                    (vpc.security_groups, vpc.internet_gateways, vpc.subnets, vpc.route_tables)
+                )
+
+                # Security groups, gateways and subnets don't depend on each
+                # other, so they are all deleted at once. The route tables
+                # follow once their subnets are gone.
+                futures = [
+                    executor.submit(limited, ec2Limit, securityGroup.delete)
+                    for securityGroup in securityGroups
+                    if securityGroup.group_name != "default"
+                ]
+                futures += [
+                    executor.submit(limited, ec2Limit, deleteGateway, gateway, vpc.vpc_id)
+                    for gateway in gateways
+                ]
+                futures += [
+                    executor.submit(limited, ec2Limit, subnet.delete)
+                    for subnet in subnets
+                ]
+                wait(futures)
+                for future in futures:
+                    future.result()
 
-            for route in vpc.route_tables.all():
-                if hasattr(route, "tags"):
-                    route.delete()
+                routeTables = [route for route in routeTables if hasattr(route, "tags")]
+                list(executor.map(lambda route: limited(ec2Limit, route.delete), routeTables))
 
             vpc.delete()
 
-        if loadBalancer != "":
-            elb.delete_load_balancer(
+        if loadBalancer:
+            getClient("elbv2").delete_load_balancer(
                 LoadBalancerArn=loadBalancer["LoadBalancerArn"]
             )
 
-        if autoScaler != "":
-            asg.delete_auto_scaling_group(
+        if autoScaler:
+            getClient("autoscaling").delete_auto_scaling_group(
                 AutoScalingGroupName=autoScaler,
                 ForceDelete=True
             )
-        
-        if launchConfig != "":
-            asg.delete_launch_configuration(
+
+        if launchConfig:
+            getClient("autoscaling").delete_launch_configuration(
                 LaunchConfigurationName=launchConfig
             )
 
-        if targetGroup != "":
-            elb.delete_target_group(
+        if targetGroup:
+            getClient("elbv2").delete_target_group(
                 TargetGroupArn=targetGroup["TargetGroupArn"]
             )
 
@@ -576,9 +702,14 @@ def cleanup(key: object, vpc: object, launchConfig: str, targetGroup: dict, load
 
 # Main
 def main():
+    # Read the startup script before anything is created on AWS
+    webAppScript = loadScript()
+
+    logListener = configureLogging()
+    creationId = getCreationId()
     logging.info("Starting Program...")
-    logging.info(f"App name set to: {APP_NAME}")
-    logging.info(f"ID generated as: {CREATION_ID}")
+    logging.info("App name set to: %s", APP_NAME)
+    logging.info("ID generated as: %s", creationId)
 
     # Ensure that variables exist for cleanup:
     key = None
@@ -587,30 +718,65 @@ def main():
     targetGroup = ""
     loadBalancer = ""
     autoScaler = ""
+    keyFuture = None
+    targetGroupFuture = None
+    launchConfigFuture = None
 
     try:
-        # Generate a new Key Pair for this environment.
-        key = createKeyPair(APP_NAME, CREATION_ID)
-
-        # Build the VPC along with subnets, gateways
-        # and security groups.
-        vpc = createVpc(APP_NAME, CREATION_ID, "10.0.0.0/16")
-        createGateway(APP_NAME, CREATION_ID, vpc)
-        createRouteTable(APP_NAME, CREATION_ID, vpc)
-        createSubnets(APP_NAME, CREATION_ID, vpc)
-        createSecurityGroups(APP_NAME, CREATION_ID, vpc)
-
-        # Create and configure the components for the auto scaling.
-        webAppScript = open(f"./scripts/webapp.sh", "r").read()
-        launchConfig = createLaunchConfig(APP_NAME, CREATION_ID, key, vpc, webAppScript)
-        targetGroup = createTargetGroup(APP_NAME, CREATION_ID, vpc)
-        loadBalancer = createLoadBalancer(APP_NAME, CREATION_ID, vpc, targetGroup)
-        autoScaler = createAutoScaler(APP_NAME, CREATION_ID, vpc, launchConfig, targetGroup)
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            # Generate a new Key Pair for this environment. It isn't needed
+            # until the Launch Configuration is created, so it is generated
+            # while the VPC is being built.
+            keyFuture = executor.submit(limited, ec2Limit, createKeyPair, APP_NAME, creationId)
+
+            # Build the VPC along with subnets, gateways
+            # and security groups.
+            vpc = createVpc(APP_NAME, creationId, "10.0.0.0/16")
+
+            # The target group, gateway, subnets and security group only
+            # depend on the VPC, so they are created concurrently.
+            # Only the EC2 requests are limited, since they are the only ones
+            # that overlap. createSubnets limits its own requests since it
+            # sends them concurrently.
+            targetGroupFuture = executor.submit(createTargetGroup, APP_NAME, creationId, vpc)
+            futures = [
+                executor.submit(limited, ec2Limit, createGateway, APP_NAME, creationId, vpc),
+                executor.submit(createSubnets, APP_NAME, creationId, vpc),
+                executor.submit(limited, ec2Limit, createSecurityGroups, APP_NAME, creationId, vpc)
+            ]
+
+            # The route table only needs the gateway, so it is created as soon
+            # as that exists rather than waiting for the rest.
+            gatewayId = futures[0].result().id
+            futures.append(executor.submit(limited, ec2Limit, createRouteTable, APP_NAME, creationId, vpc, gatewayId))
+            wait(futures)
+            gateway, subnets, securityGroup, routeTable = [future.result() for future in futures]
+
+            # Keep hold of the IDs the remaining components need so they don't
+            # have to be looked up on AWS again.
+            sgId = securityGroup.group_id
+            publicSubnetIds = [subnet.subnet_id for subnet in subnets[:3]]
+
+            # Create and configure the components for the auto scaling. The
+            # Launch Configuration is created alongside the Load Balancer.
+            key = keyFuture.result()
+            launchConfigFuture = executor.submit(createLaunchConfig, APP_NAME, creationId, key, sgId, webAppScript)
+            targetGroup = targetGroupFuture.result()
+            loadBalancer = createLoadBalancer(APP_NAME, creationId, sgId, publicSubnetIds)
+            createListener(APP_NAME, creationId, loadBalancer, targetGroup)
+            launchConfig = launchConfigFuture.result()
+            autoScaler = createAutoScaler(APP_NAME, creationId, publicSubnetIds, launchConfig, targetGroup)
 
     except Exception as err:
-        logging.error(f"An error occurred: {err}")
+        logging.error("An error occurred: %s", err)
         print(err)
         logging.info("Attempting cleanup...")
+
+        # Resources created in the background still need to be cleaned up,
+        # even if the main thread failed before collecting them.
+        key = finishedResult(keyFuture, key)
+        targetGroup = finishedResult(targetGroupFuture, targetGroup)
+        launchConfig = finishedResult(launchConfigFuture, launchConfig)
         if cleanup(key, vpc, launchConfig, targetGroup, loadBalancer, autoScaler):
             logging.info("Cleanup Succeeded!")
             print("Cleanup Succeeded!")
@@ -618,12 +784,9 @@ def main():
             logging.info("Cleanup Failed! To avoid unexpected costs please check for remaining resources on AWS.")
             print("Cleanup Failed! To avoid unexpected costs please check for remaining resources on AWS.")
 
+    finally:
+        stopLogging(logListener)
 
-if sys.version_info[0] >= 3 and sys.version_info[1] >= 7:
+
+if __name__ == "__main__":
     main()
-else:
-    logging.error("Python version out of date!")
-    print(
-        "Your Python version can't run this script.\nPlease make sure " +
-        "you're updated to Python 3.7 or newer."
-    )